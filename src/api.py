@@ -1,15 +1,22 @@
 from fastapi import FastAPI, File, UploadFile, HTTPException
 from fastapi.responses import JSONResponse
-import shutil
+import asyncio
+import concurrent.futures
+import contextlib
+import hashlib
 import os
-import uuid 
+import pathlib
 import logging
+import aiofiles
+import aiofiles.tempfile
+import cv2
+from collections import OrderedDict
 
 
 #from .main_pipeline import process_single_image_pipeline # This might need adjustment
 
-from .process import preprocess_image
-from .ocr_extract import extract_text_from_image
+from .process import preprocess_image_array
+from .ocr_extract import extract_text_from_image, limit_worker_threads
 from .text_clean import clean_ocr_text, structure_text
 
 
@@ -17,55 +24,121 @@ from .text_clean import clean_ocr_text, structure_text
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="Handwritten Text OCR API")
+@contextlib.asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    _EXECUTOR.shutdown(wait=False, cancel_futures=True)
+
+
+app = FastAPI(title="Handwritten Text OCR API", lifespan=lifespan)
 
 # Define base paths relative to this api.py file
 CURRENT_SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 PROJECT_ROOT = os.path.dirname(CURRENT_SCRIPT_DIR) # This assumes api.py is in src/
 
 UPLOAD_DIR = os.path.join(PROJECT_ROOT, "temp_uploads")
-PROCESSED_DIR_API = os.path.join(UPLOAD_DIR, "processed") # Store processed images for API requests temporarily
+PROCESSED_DIR_API = os.path.join(UPLOAD_DIR, "processed") # Preprocessed images saved for debugging, named by content hash
+
+# Preprocessed images are kept in memory; set SAVE_PROCESSED=1 to also write them to PROCESSED_DIR_API (for debugging)
+SAVE_PROCESSED = os.environ.get("SAVE_PROCESSED", "").strip().lower() in ("1", "true", "yes")
+
+UPLOAD_CHUNK_SIZE = 1 << 20 # 1 MB per read when streaming uploads to disk
+CACHE_MAX_ENTRIES = 256 # Number of uploads whose results are kept in the LRU cache
 
 os.makedirs(UPLOAD_DIR, exist_ok=True)
-os.makedirs(PROCESSED_DIR_API, exist_ok=True)
+if SAVE_PROCESSED:
+    os.makedirs(PROCESSED_DIR_API, exist_ok=True)
+
+
+# Worker processes for the CPU-heavy OpenCV / Tesseract steps
+_EXECUTOR = concurrent.futures.ProcessPoolExecutor(max_workers=os.cpu_count(), initializer=limit_worker_threads)
+
+
+# Content hash of an upload -> final cleaned text, in least-recently-used order
+_TEXT_CACHE = OrderedDict()
+
+
+def _processed_dump_path(cache_key: str):
+    return os.path.join(PROCESSED_DIR_API, f"{cache_key}.png")
+
+
+def _cache_get(cache_key: str):
+    text = _TEXT_CACHE.get(cache_key)
+    if text is not None:
+        _TEXT_CACHE.move_to_end(cache_key)
+    return text
+
+
+def _cache_put(cache_key: str, text: str):
+    """
+    Stores a result and evicts the least recently used entries.
+    Empty results are not cached: OCR failures also produce empty text, so those uploads are processed again.
+    """
+    if not text:
+        return
+    _TEXT_CACHE[cache_key] = text
+    _TEXT_CACHE.move_to_end(cache_key)
+    while len(_TEXT_CACHE) > CACHE_MAX_ENTRIES:
+        _TEXT_CACHE.popitem(last=False)
+
+
+def _preprocess_and_ocr(image_path: str, output_path: str = None):
+    """
+    Runs in a worker process: preprocesses the image and OCRs the in-memory result,
+    saving the processed image to output_path only if one is given.
+    Returns None if preprocessing failed.
+    """
+    processed_img = preprocess_image_array(image_path)
+    if processed_img is None:
+        return None
+    if output_path:
+        cv2.imwrite(output_path, processed_img)
+    return extract_text_from_image(processed_img)
 
 
-async def process_uploaded_image(image_path: str, original_filename: str):
+async def process_uploaded_image(image_path: str, original_filename: str, cache_key: str):
     """
     Simplified pipeline for a single uploaded image.
     Takes an image path, processes it, and returns cleaned text.
+    Results are cached by the content hash of the upload (cache_key).
     """
+    cached_text = _cache_get(cache_key)
+    if cached_text is not None:
+        logger.info(f"API: Cache hit for {original_filename} ({cache_key})")
+        return cached_text
+
     logger.info(f"API: Starting processing for {original_filename}")
+    loop = asyncio.get_running_loop()
     
-    # 1. Preprocess
-    processed_image_name = f"processed_{uuid.uuid4().hex}_{original_filename}"
-    processed_image_api_path = os.path.join(PROCESSED_DIR_API, processed_image_name)
+    # 1. Preprocess and OCR the processed image in memory (also saved to disk with SAVE_PROCESSED)
+    processed_image_api_path = _processed_dump_path(cache_key) if SAVE_PROCESSED else None
     
     try:
-        logger.info(f"API: Preprocessing {image_path} -> {processed_image_api_path}")
-        preprocess_image(image_path, processed_image_api_path)
-        if not os.path.exists(processed_image_api_path):
-            logger.error("API: Preprocessing failed to create output file.")
+        logger.info(f"API: Preprocessing and performing OCR on {image_path}")
+        ocr_text = await loop.run_in_executor(_EXECUTOR, _preprocess_and_ocr, image_path, processed_image_api_path)
+        if ocr_text is None:
+            logger.error("API: Preprocessing failed to produce an image.")
             raise HTTPException(status_code=500, detail="Image preprocessing failed.")
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"API: Preprocessing error: {e}")
-        raise HTTPException(status_code=500, detail=f"Image preprocessing error: {str(e)}")
-
-    # 2. OCR (on processed image)
-    logger.info(f"API: Performing OCR on {processed_image_api_path}")
-    try:
-        ocr_text = extract_text_from_image(processed_image_api_path)
-        if not ocr_text and os.path.exists(processed_image_api_path): # If no text, maybe try raw
-            logger.warning("API: OCR on processed image yielded no text. Trying raw image.")
-            ocr_text = extract_text_from_image(image_path) # Fallback to raw if processed yields nothing
-    except Exception as e:
-        logger.error(f"API: OCR extraction error: {e}")
-        raise HTTPException(status_code=500, detail=f"OCR extraction error: {str(e)}")
+        logger.error(f"API: Preprocessing/OCR error: {e}")
+        raise HTTPException(status_code=500, detail=f"Image processing error: {str(e)}")
+
+    # 2. OCR on the raw image if the processed one yielded no text
+    if not ocr_text:
+        logger.warning("API: OCR on processed image yielded no text. Trying raw image.")
+        try:
+            ocr_text = await loop.run_in_executor(_EXECUTOR, extract_text_from_image, image_path)
+        except Exception as e:
+            logger.error(f"API: OCR extraction error: {e}")
+            raise HTTPException(status_code=500, detail=f"OCR extraction error: {str(e)}")
 
     # 3. Clean and Structure
     logger.info("API: Cleaning and structuring text.")
-    cleaned_text = clean_ocr_text(ocr_text)
-    final_text = structure_text(cleaned_text)
+    cleaned_text = await asyncio.to_thread(clean_ocr_text, ocr_text)
+    final_text = await asyncio.to_thread(structure_text, cleaned_text)
+    _cache_put(cache_key, final_text)
     
     logger.info(f"API: Successfully processed {original_filename}")
     return final_text
@@ -77,21 +150,23 @@ async def extract_text_endpoint(image: UploadFile = File(...)):
     Accepts an image upload, processes it through the OCR pipeline,
     and returns the cleaned text as JSON.
     """
-    # Create a unique filename for the uploaded image to avoid collisions
-    unique_id = uuid.uuid4().hex
     original_filename = image.filename if image.filename else "unknown_image"
-    temp_filename = f"{unique_id}_{original_filename}"
-    temp_file_path = os.path.join(UPLOAD_DIR, temp_filename)
-
-    logger.info(f"API: Received file: {original_filename}, saving to {temp_file_path}")
+    temp_file_path = None
 
     try:
-        # Save uploaded file temporarily
-        with open(temp_file_path, "wb+") as file_object:
-            shutil.copyfileobj(image.file, file_object)
+        # Save uploaded file to a uniquely named temporary file, streaming it in chunks so the
+        # event loop is never blocked. The content hash is computed along the way and used as the cache key.
+        content_hash = hashlib.blake2b(digest_size=16)
+        suffix = pathlib.Path(original_filename).suffix
+        async with aiofiles.tempfile.NamedTemporaryFile("wb", dir=UPLOAD_DIR, suffix=suffix, delete=False) as file_object:
+            temp_file_path = file_object.name
+            logger.info(f"API: Received file: {original_filename}, saving to {temp_file_path}")
+            while chunk := await image.read(UPLOAD_CHUNK_SIZE):
+                content_hash.update(chunk)
+                await file_object.write(chunk)
         
         # Process the saved image
-        cleaned_text_result = await process_uploaded_image(temp_file_path, original_filename)
+        cleaned_text_result = await process_uploaded_image(temp_file_path, original_filename, content_hash.hexdigest())
 
         return JSONResponse(content={
             "filename": original_filename,
@@ -104,20 +179,16 @@ async def extract_text_endpoint(image: UploadFile = File(...)):
         logger.error(f"API: General error during processing {original_filename}: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {str(e)}")
     finally:
-        # Clean up: remove the temporary uploaded file and its processed version
-        if os.path.exists(temp_file_path):
-            os.remove(temp_file_path)
-            logger.info(f"API: Removed temporary raw file: {temp_file_path}")
-
-            
-        processed_image_api_path_to_clean = os.path.join(PROCESSED_DIR_API, f"processed_{unique_id}_{original_filename}")
-        if os.path.exists(processed_image_api_path_to_clean):
-            os.remove(processed_image_api_path_to_clean)
-            logger.info(f"API: Removed temporary processed file: {processed_image_api_path_to_clean}")
+        # Clean up: remove the temporary uploaded file
+        if temp_file_path:
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(temp_file_path)
+                logger.info(f"API: Removed temporary raw file: {temp_file_path}")
 
 
 if __name__ == "__main__":
     import uvicorn
     # uvicorn src.api:app --reload
     print("Starting FastAPI server. Access at http://127.0.0.1:8000/docs")
-    uvicorn.run("api:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
+    # loop/http "auto" pick uvloop and httptools (installed by uvicorn[standard]) where available, e.g. not on Windows
+    uvicorn.run("api:app", host="0.0.0.0", port=8000, reload=True, loop="auto", http="auto")
\ No newline at end of file
@@ -1,7 +1,9 @@
 import os
 import shutil
+import cv2
+from multiprocessing import Pool
 from process import preprocess_image
-from ocr_extract import extract_text_from_image
+from ocr_extract import extract_text_from_image, limit_worker_threads
 from text_clean import clean_ocr_text, structure_text
 
 # Define base paths
@@ -103,12 +105,12 @@ def run_full_pipeline():
         raw_image_files = [f for f in os.listdir(RAW_IMAGES_DIR) if f.lower().endswith(('.png', '.jpg', '.jpeg', '.tiff', '.bmp'))]
 
 
-    for raw_image_filename in raw_image_files:
-        process_single_image_pipeline(raw_image_filename)
+    # Each image is independent, so process them in parallel across all cores
+    with Pool(processes=os.cpu_count(), initializer=limit_worker_threads) as pool:
+        for _ in pool.imap_unordered(process_single_image_pipeline, raw_image_files, chunksize=1):
+            pass
 
 if __name__ == '__main__':
-    # This makes sure cv2 and other imports are available when running main_pipeline directly
-    import cv2 # For dummy image creation if needed
     import numpy as np # For dummy image creation if needed
     run_full_pipeline()
     print("\n--- OCR Pipeline Complete ---")
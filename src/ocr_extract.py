@@ -1,19 +1,74 @@
+import os
+import threading
+import cv2
 import pytesseract
 from PIL import Image
 
-def extract_text_from_image(image_path, lang='eng'):
+def limit_worker_threads():
+    """
+    Pool initializer: gives each worker process a single Tesseract (OpenMP) and OpenCV
+    thread, so that one worker per core does not oversubscribe the cores.
+    """
+    os.environ["OMP_THREAD_LIMIT"] = "1"
+    cv2.setNumThreads(1)
+
+# Optional: tesserocr binds Tesseract's C++ API, so the engine is loaded once per process and reused
+# instead of spawning a tesseract process (and reloading traineddata) for every image.
+_TESS_APIS = {} # lang -> PyTessBaseAPI, or None if it failed to initialise (pytesseract is used instead)
+_TESS_LOCK = threading.Lock()
+_TESSEROCR_AVAILABLE = True
+
+def _get_tess_api(lang):
+    """
+    Returns this process's tesserocr API instance for lang, creating it on first use.
+    Returns None if tesserocr is not installed or failed to initialise for lang.
+    """
+    global _TESSEROCR_AVAILABLE
+    if not _TESSEROCR_AVAILABLE:
+        return None
+    if lang in _TESS_APIS:
+        return _TESS_APIS[lang]
+    try:
+        # Imported here rather than at module load, so libtesseract (and its OpenMP runtime) is loaded
+        # in the worker process after limit_worker_threads() has set OMP_THREAD_LIMIT
+        from tesserocr import PyTessBaseAPI, PSM
+    except ImportError:
+        _TESSEROCR_AVAILABLE = False
+        return None
+    try:
+        api = PyTessBaseAPI(lang=lang, psm=PSM.AUTO)
+    except RuntimeError as e:
+        print(f"Error: Could not initialise tesserocr for lang '{lang}': {e}")
+        print("Falling back to pytesseract.")
+        api = None
+    _TESS_APIS[lang] = api
+    return api
+
+def extract_text_from_image(image, lang='eng'):
     """
     Extracts text from an image using Tesseract OCR.
-    :param image_path: Path to the image file.
+    :param image: Path to the image file, or an already decoded image as a NumPy array
+                  (e.g. the output of preprocess_image_array), which skips decoding it again.
     :param lang: Language for OCR (default is English).
     :return: Extracted text as a string.
+    Uses a persistent tesserocr engine when tesserocr is installed, pytesseract otherwise.
     """
     try:
-        img = Image.open(image_path)
-        text = pytesseract.image_to_string(img, lang=lang)
+        # A path is handed to Tesseract as-is so it decodes the file itself, without a PIL round-trip
+        if isinstance(image, str) and not os.path.exists(image):
+            raise FileNotFoundError(image)
+        with _TESS_LOCK:
+            api = _get_tess_api(lang)
+            if api is not None:
+                if isinstance(image, str):
+                    api.SetImageFile(image)
+                else:
+                    api.SetImage(Image.fromarray(image))
+                return api.GetUTF8Text()
+        text = pytesseract.image_to_string(image, lang=lang)
         return text
     except FileNotFoundError:
-        print(f"Error: Image file not found at {image_path}")
+        print(f"Error: Image file not found at {image}")
         return ""
     except pytesseract.TesseractNotFoundError:
         print("Error: Tesseract is not installed or not found in your PATH.")
@@ -27,7 +82,6 @@ def extract_text_from_image(image_path, lang='eng'):
 if __name__ == '__main__':
     # Example usage:
     # Ensure you have an image (e.g., from preprocess.py output)
-    import os
     if not os.path.exists('../images_processed/image_processed_1.png'):
         print("Please run preprocess.py first or place a processed image at '../images_processed/image_processed_1.png'")
     else:
@@ -1,8 +1,11 @@
+import os
 import cv2
 import numpy as np
 from skimage.transform import radon # For skew detection
 from skimage.color import rgb2gray
 
+SKEW_DETECTION_MAX_DIM = 800 # Longest side of the working copy used to detect skew
+
 def convert_to_grayscale(image_path):
     """Converts an image to grayscale."""
     img = cv2.imread(image_path)
@@ -11,9 +14,13 @@ def convert_to_grayscale(image_path):
     gray_img = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
     return gray_img
 
-def denoise_image(gray_img):
-    """Applies Gaussian blur for denoising."""
-    blurred_img = cv2.GaussianBlur(gray_img, (5, 5), 0)
+def denoise_image(gray_img, dst=None):
+    """
+    Applies Gaussian blur for denoising.
+    Pass a preallocated dst (e.g. np.empty_like(gray_img), or gray_img itself)
+    to reuse its buffer instead of allocating a new output.
+    """
+    blurred_img = cv2.GaussianBlur(gray_img, (5, 5), 0, dst=dst)
     return blurred_img
 
 def binarize_image(blurred_img):
@@ -26,11 +33,20 @@ def correct_skew(image_cv):
     Corrects skew in a binary image using Radon transform.
     This is a more robust method but can be computationally intensive.
     Input image should be binary (black and white).
+    The angle is detected on a downsampled copy and applied to the full-resolution image.
     """
-    if len(image_cv.shape) == 3: # Ensure it's grayscale or binary
-        image_gray = rgb2gray(image_cv)
+    # Skew is a global property, so detect it on a small working copy
+    (h, w) = image_cv.shape[:2]
+    scale = SKEW_DETECTION_MAX_DIM / max(h, w)
+    if scale < 1:
+        small_img = cv2.resize(image_cv, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    else:
+        small_img = image_cv
+
+    if len(small_img.shape) == 3: # Ensure it's grayscale or binary
+        image_gray = rgb2gray(small_img)
     else:
-        image_gray = image_cv
+        image_gray = small_img
 
     # Binarize if not already (Radon works best on binary)
     if image_gray.max() > 1: # Assuming it's not already 0-1 range
@@ -41,18 +57,18 @@ def correct_skew(image_cv):
 
 
     # Radon transform
-    sinogram = radon(image_binary)
-
-    # Find the rotation angle
-    r = np.array([np.sqrt(np.mean(np.abs(line) ** 2)) for line in sinogram.transpose()])
-    rotation_angle_radon = np.argmax(r)
-    # The radon function in scikit-image returns angles from 0 to 180 degrees.
-    # We need to adjust this if the peak is near 0 or 180.
+    # Document skew is small, so only evaluate a narrow window around 90 degrees
+    # instead of the full 0-180 range.
+    theta = np.arange(85., 96., 0.5)
+    sinogram = radon(image_binary, theta=theta)
+
+    # Find the rotation angle (RMS of each projection, vectorized over the sinogram)
+    r = np.sqrt(np.mean(sinogram ** 2, axis=0))
+    rotation_angle_radon = theta[np.argmax(r)]
     # The angle from radon is theta, and the skew angle is often 90 - theta or theta - 90.
     skew_angle = -(90 - rotation_angle_radon) # Common heuristic
 
-    # Rotate the image to correct skew
-    (h, w) = image_cv.shape[:2]
+    # Rotate the full-resolution image to correct skew
     center = (w // 2, h // 2)
     M = cv2.getRotationMatrix2D(center, skew_angle, 1.0)
     rotated_img = cv2.warpAffine(image_cv, M, (w, h), flags=cv2.INTER_CUBIC, borderMode=cv2.BORDER_REPLICATE)
@@ -61,18 +77,32 @@ def correct_skew(image_cv):
     return rotated_img
 
 
-def preprocess_image(image_path, output_path):
-    """Full preprocessing pipeline."""
-    img_cv = cv2.imread(image_path)
-    if img_cv is None:
-        print(f"Error: Image not found at {image_path}")
+def _read_grayscale(image_path):
+    """
+    Reads and decodes an image file as grayscale.
+    The encoded bytes are read into one buffer and decoded from it directly
+    (freed as soon as this returns), instead of going through cv2.imread.
+    Returns None if the file is missing or cannot be decoded, like cv2.imread.
+    """
+    try:
+        data = np.fromfile(image_path, dtype=np.uint8)
+    except OSError:
+        return None
+    if data.size == 0:
         return None
+    return cv2.imdecode(data, cv2.IMREAD_GRAYSCALE)
+
 
-    # 1. Grayscale Conversion
-    gray_img = cv2.cvtColor(img_cv, cv2.COLOR_BGR2GRAY)
+def preprocess_image_array(image_path):
+    """Full preprocessing pipeline. Returns the binarized image as a NumPy array."""
+    # 1. Grayscale Conversion (decode straight to a single channel, no BGR copy)
+    gray = _read_grayscale(image_path)
+    if gray is None:
+        print(f"Error: Image not found at {image_path}")
+        return None
 
-    # 2. Denoising
-    denoised_img = denoise_image(gray_img)
+    # 2. Denoising (in place, reusing the grayscale buffer)
+    denoise_image(gray, dst=gray)
 
     # 3. Binarization (Otsu's)
     # binary_img = binarize_image(denoised_img)
@@ -84,22 +114,30 @@ def preprocess_image(image_path, output_path):
     # It might be better to apply it to a binarized image if text contrast is very high.
     # Or, if Radon fails, a simpler projection profile method could be tried.
     # try:
-    #     skew_corrected_img = correct_skew(denoised_img) # Pass the original color image if using rgb2gray inside
+    #     skew_corrected_img = correct_skew(gray) # Pass the original color image if using rgb2gray inside
     # except Exception as e:
     #     print(f"Could not apply skew correction on {image_path}: {e}. Using denoised image.")
-    #     skew_corrected_img = denoised_img # Fallback
+    #     skew_corrected_img = gray # Fallback
 
-    # 5. Binarization (apply after skew correction)
-    final_binary_img = binarize_image(denoised_img)
+    # 5. Binarization (apply after skew correction, in place)
+    cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU, dst=gray)
+
+    return gray
+
+
+def preprocess_image(image_path, output_path):
+    """Full preprocessing pipeline, saving the result to output_path."""
+    processed_img = preprocess_image_array(image_path)
+    if processed_img is None:
+        return None
 
-    cv2.imwrite(output_path, final_binary_img)
+    cv2.imwrite(output_path, processed_img)
     return output_path
 
 if __name__ == '__main__':
     # Example usage:
     # Create dummy images if they don't exist for testing
     # Ensure you have images in 'images_raw/'
-    import os
     if not os.path.exists('../images_raw/image_raw_1.png'):
         # Create a dummy image if it doesn't exist
         dummy_image = np.zeros((100, 400), dtype=np.uint8)
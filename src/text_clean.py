@@ -1,5 +1,28 @@
 import re
 
+# Precompiled patterns used by clean_ocr_text
+_WS = re.compile(r'[ \t]+')
+_BLANK_LINES = re.compile(r'\n\s*\n')
+
+# A whole bullet line for structure_text (-, *, numbers followed by . or )), capturing the
+# line without its surrounding whitespace. [^\S\n] is whitespace other than a newline.
+_BULLET_LINE = re.compile(r'^[^\S\n]*((?:[-*\u2022]|\d+[\.\)])[^\S\n]+.*\S)[^\S\n]*$', re.MULTILINE)
+
+def _normalize_ws(text):
+    """
+    Normalizes whitespace: runs of spaces/tabs become a single space, any run of
+    newlines (with only whitespace between them) becomes a single newline, and
+    leading/trailing whitespace is removed.
+    """
+    return _BLANK_LINES.sub('\n', _WS.sub(' ', text)).strip()
+
+# Every byte that is not an ASCII letter or digit, for bytes.translate deletion
+_NON_ALNUM = bytes(c for c in range(256) if not (48 <= c <= 57 or 65 <= c <= 90 or 97 <= c <= 122))
+
+def _count_alnum(line):
+    """Counts ASCII alphanumeric characters ([a-zA-Z0-9]) in a line."""
+    return len(line.encode('ascii', 'ignore').translate(None, _NON_ALNUM))
+
 def clean_ocr_text(text):
     """
     Cleans the raw OCR text output.
@@ -7,14 +30,13 @@ def clean_ocr_text(text):
     - Attempts to fix common OCR errors (can be expanded).
     - Removes lines that are likely OCR noise (e.g., very short lines with junk).
     """
-    if not text:
+    # Empty or whitespace-only input (common when OCR fails) cleans to nothing
+    if not text or text.isspace():
         return ""
 
     # 1. Normalize whitespace: remove leading/trailing, replace multiple spaces/tabs with single space
-    cleaned_text = re.sub(r'[ \t]+', ' ', text).strip()
-    # Replace multiple newlines with a single newline
-    cleaned_text = re.sub(r'\n\s*\n+', '\n\n', cleaned_text) # Keep paragraph breaks
-    cleaned_text = re.sub(r'\n+', '\n', cleaned_text) # Consolidate other newlines
+    # and consolidate multiple newlines into a single newline
+    cleaned_text = _normalize_ws(text)
 
 
     # 2. Common OCR error corrections (example, expand based on observed errors)
@@ -27,9 +49,13 @@ def clean_ocr_text(text):
     # for error, correction in corrections.items():
     #     cleaned_text = re.sub(error, correction, cleaned_text)
 
+    # A single non-empty line is always kept by the filter below, so skip it
+    if '\n' not in cleaned_text:
+        return cleaned_text
+
     # 3. Remove very short lines that are likely noise (e.g. less than 3 alphanumeric chars)
     lines = cleaned_text.split('\n')
-    cleaned_lines = [line for line in lines if len(re.findall(r'[a-zA-Z0-9]', line)) >= 3 or not line.strip() == ""]
+    cleaned_lines = [line for line in lines if _count_alnum(line) >= 3 or not line.strip() == ""]
     cleaned_text = '\n'.join(cleaned_lines)
 
 
@@ -54,17 +80,9 @@ def structure_text(text):
     Attempts to structure text, e.g., identify bullet points.
     This is a basic example.
     """
-    lines = text.split('\n')
-    structured_lines = []
-    for line in lines:
-        stripped_line = line.strip()
-        # Basic bullet point detection (-, *, numbers followed by . or ))
-        if re.match(r'^[-*\u2022]\s+', stripped_line) or \
-           re.match(r'^\d+[\.\)]\s+', stripped_line):
-            structured_lines.append("  " + stripped_line) # Indent bullets
-        else:
-            structured_lines.append(line)
-    return '\n'.join(structured_lines)
+    # Basic bullet point detection over the whole text in one pass: bullet lines are
+    # stripped and indented, all other lines are left as they are
+    return _BULLET_LINE.sub(r'  \1', text)
 
 if __name__ == '__main__':
     sample_ocr_output = """